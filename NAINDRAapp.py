@@ -2,36 +2,59 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+import os
+
+import cache_dados
+import exportar_dados
+import leitura_dados
+import monitor_dados
 
 # Configuração da página
 st.set_page_config(page_title="BI Instagram", layout="wide", initial_sidebar_state="expanded")
 
-# Função para carregar dados
-@st.cache_data
-def carregar_dados(arquivo=None):
-    if arquivo is not None:
-        try:
-            # Carregar dados do arquivo CSV
-            df = pd.read_csv(arquivo)
-            
-            # Verificar se as colunas necessárias existem
-            colunas_necessarias = ["Mês", "Contas com Engajamento", "Seguidores", "Alcance", "Interações", "Curtidas", "Comentários"]
-            colunas_faltantes = [col for col in colunas_necessarias if col not in df.columns]
-            
-            if colunas_faltantes:
-                st.warning(f"Colunas faltantes no CSV: {', '.join(colunas_faltantes)}")
-                st.info("Usando dados padrão. Certifique-se que seu CSV tem todas as colunas necessárias.")
-                return carregar_dados_padrao()
-            
-            # Continuar com o processamento se o CSV estiver correto
-            return processar_dados(df)
-                
-        except Exception as e:
-            st.error(f"Erro ao carregar arquivo: {e}")
-            return carregar_dados_padrao()
-    else:
-        return carregar_dados_padrao()
+# Métricas somáveis usadas na comparação de períodos
+colunas_comparacao = ["Alcance", "Interações", "Curtidas", "Comentários"]
+
+# Função para carregar dados (cache compartilhado, indexado pela impressão digital da fonte)
+def carregar_dados(arquivos=None):
+    if arquivos:
+        # A impressão digital de cada arquivo é calculada uma vez por upload (file_id) e
+        # guardada na sessão; trocar mês, conta ou período não relê nem refaz o hash dos bytes
+        anteriores = st.session_state.get("impressoes_upload", {})
+        impressoes = {a.file_id: anteriores.get(a.file_id) or cache_dados.impressao_digital(a.getvalue())
+                      for a in arquivos}
+        st.session_state["impressoes_upload"] = impressoes
+        
+        # Cada arquivo é lido e validado separadamente, em paralelo
+        lidos = leitura_dados.ler_arquivos([(a.name, impressoes[a.file_id], a.getvalue) for a in arquivos],
+                                           colunas_necessarias)
+        for nome, _, _, erro in lidos:
+            if erro:
+                st.error(f"Arquivo {nome} ignorado: {erro}")
+        
+        validos = [(impressao, df) for _, impressao, df, _ in lidos if df is not None]
+        if validos:
+            impressao = cache_dados.impressao_digital("".join(impressao for impressao, _ in validos))
+            # Processamento com falha (DataFrame vazio) não vai para o cache
+            df = cache_dados.obter("upload", impressao, "dados",
+                                   lambda: processar_dados(leitura_dados.combinar([df for _, df in validos]))
+                                   .pipe(lambda df: None if df.empty else df))
+            if df is not None:
+                return "upload", impressao, df
+    
+    # Sem upload válido, usar o último conjunto publicado pela pasta monitorada
+    publicado = monitor_dados.dados_publicados(monitor)
+    if publicado is not None:
+        if arquivos:
+            st.info("Usando os dados da pasta monitorada. Certifique-se que seu CSV tem todas as colunas necessárias.")
+        impressao, df = publicado
+        return "diretorio", impressao, cache_dados.obter("diretorio", impressao, "dados", lambda: df)
+    
+    if arquivos:
+        st.info("Usando dados padrão. Certifique-se que seu CSV tem todas as colunas necessárias.")
+    # Os dados padrão são próprios de cada dashboard: chave fixa, não é hash de conteúdo
+    impressao = "padrao:naindra"
+    return "padrao", impressao, cache_dados.obter("padrao", impressao, "dados", carregar_dados_padrao)
 
 def carregar_dados_padrao():
     df_padrao = pd.DataFrame({
@@ -45,86 +68,43 @@ def carregar_dados_padrao():
     })
     return processar_dados(df_padrao)
 
-def processar_dados(df):
-    # Adicionar data para ordenação correta
-    # Mapear nomes de meses para datas reais para ordenação correta
-    meses_mapeamento = {
-        # 2023
-        "Dez/23": datetime(2023, 12, 1),
-        "Dezembro": datetime(2023, 12, 1),
-        "Dezembro 2023": datetime(2023, 12, 1),
-        
-        # 2024
-        "Jan/24": datetime(2024, 1, 1),
-        "Janeiro": datetime(2024, 1, 1),
-        "Janeiro 2024": datetime(2024, 1, 1),
-        
-        "Fev/24": datetime(2024, 2, 1),
-        "Fevereiro": datetime(2024, 2, 1),
-        "Fevereiro 2024": datetime(2024, 2, 1),
-        
-        "Mar/24": datetime(2024, 3, 1),
-        "Março": datetime(2024, 3, 1),
-        "Março 2024": datetime(2024, 3, 1),
-        
-        "Abr/24": datetime(2024, 4, 1),
-        "Abril": datetime(2024, 4, 1),
-        "Abril 2024": datetime(2024, 4, 1),
-        
-        "Mai/24": datetime(2024, 5, 1),
-        "Maio": datetime(2024, 5, 1),
-        "Maio 2024": datetime(2024, 5, 1),
-        
-        "Jun/24": datetime(2024, 6, 1),
-        "Junho": datetime(2024, 6, 1),
-        "Junho 2024": datetime(2024, 6, 1),
-        
-        "Jul/24": datetime(2024, 7, 1),
-        "Julho": datetime(2024, 7, 1),
-        "Julho 2024": datetime(2024, 7, 1),
-        
-        "Ago/24": datetime(2024, 8, 1),
-        "Agosto": datetime(2024, 8, 1),
-        "Agosto 2024": datetime(2024, 8, 1),
-        
-        "Set/24": datetime(2024, 9, 1),
-        "Setembro": datetime(2024, 9, 1),
-        "Setembro 2024": datetime(2024, 9, 1),
-        
-        "Out/24": datetime(2024, 10, 1),
-        "Outubro": datetime(2024, 10, 1),
-        "Outubro 2024": datetime(2024, 10, 1),
-        
-        "Nov/24": datetime(2024, 11, 1),
-        "Novembro": datetime(2024, 11, 1),
-        "Novembro 2024": datetime(2024, 11, 1),
-        
-        "Dez/24": datetime(2024, 12, 1),
-        "Dezembro 2024": datetime(2024, 12, 1)
-    }
+# Função para calcular as métricas derivadas (sem interface; erros são propagados,
+# assim pode ser usada também pela thread do monitor de pasta)
+def calcular_metricas(df):
+    
+    # Criar coluna de data para ordenação correta
+    df["Data"] = leitura_dados.converter_datas(df["Mês"])
+    df = df.sort_values(["Conta", "Data"] if "Conta" in df.columns else "Data").reset_index(drop=True)
     
+    # Garantir que todas as colunas numéricas sejam do tipo float para evitar erros
+    colunas_numericas = ["Contas com Engajamento", "Seguidores", "Alcance", "Interações", "Curtidas", "Comentários"]
+    for col in colunas_numericas:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Com a coluna "Conta", crescimento e acumulados são calculados dentro de cada conta
+    contas = df["Conta"] if "Conta" in df.columns else pd.Series("", index=df.index)
+    
+    # Calcular métricas de crescimento (exceto para o primeiro mês)
+    df["Crescimento Seguidores"] = df["Seguidores"].groupby(contas).pct_change() * 100
+    df["Crescimento Alcance"] = df["Alcance"].groupby(contas).pct_change() * 100
+    df["Crescimento Engajamento"] = df["Contas com Engajamento"].groupby(contas).pct_change() * 100
+    
+    # Taxa de engajamento
+    df["Taxa de Engajamento"] = (df["Interações"] / df["Alcance"]) * 100
+    
+    # Somas acumuladas calculadas uma única vez por conjunto de dados,
+    # assim a soma de qualquer intervalo é só uma diferença entre duas posições
+    for col in colunas_comparacao:
+        df[f"Acumulado {col}"] = df[col].fillna(0).groupby(contas).cumsum()
+    
+    return df
+
+def processar_dados(df):
     try:
-        # Criar coluna de data para ordenação
-        df["Data"] = df["Mês"].map(meses_mapeamento)
-        df = df.sort_values("Data")
-        
-        # Garantir que todas as colunas numéricas sejam do tipo float para evitar erros
-        colunas_numericas = ["Contas com Engajamento", "Seguidores", "Alcance", "Interações", "Curtidas", "Comentários"]
-        for col in colunas_numericas:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Calcular métricas de crescimento (exceto para o primeiro mês)
-        df["Crescimento Seguidores"] = df["Seguidores"].pct_change() * 100
-        df["Crescimento Alcance"] = df["Alcance"].pct_change() * 100
-        df["Crescimento Engajamento"] = df["Contas com Engajamento"].pct_change() * 100
-        
-        # Taxa de engajamento
-        df["Taxa de Engajamento"] = (df["Interações"] / df["Alcance"]) * 100
+        return calcular_metricas(df)
     except Exception as e:
         st.error(f"Erro ao processar dados: {e}")
         return pd.DataFrame()
-    
-    return df
 
 # Função para baixar arquivo CSV modelo
 def baixar_csv_modelo():
@@ -139,28 +119,86 @@ def baixar_csv_modelo():
     })
     return df_modelo.to_csv(index=False).encode('utf-8')
 
+# Verificar se as colunas necessárias existem
+colunas_necessarias = ["Mês", "Contas com Engajamento", "Seguidores", "Alcance", "Interações", "Curtidas", "Comentários"]
+
+# Pasta de dados monitorada (opcional, definida pela variável de ambiente BI_PASTA_DADOS_NAINDRA)
+monitor = monitor_dados.iniciar(os.environ.get("BI_PASTA_DADOS_NAINDRA"), colunas_necessarias, calcular_metricas)
+
 # Sidebar para upload de arquivo
 with st.sidebar:
     st.title("Filtros")
-    uploaded_file = st.file_uploader("Carregar arquivo CSV", type="csv")
+    uploaded_files = st.file_uploader("Carregar arquivos CSV", type="csv", accept_multiple_files=True)
     
     # Adicionar opção para baixar CSV modelo
     st.download_button(
         label="📥 Baixar CSV modelo",
-        data=baixar_csv_modelo(),
+        data=baixar_csv_modelo,
         file_name="modelo_instagram_dados.csv",
         mime="text/csv",
     )
 
 # Carregar dados
-if uploaded_file is not None:
-    df = carregar_dados(uploaded_file)
-else:
-    df = carregar_dados()
+fonte, impressao, df = carregar_dados(uploaded_files)
 
 # Continuação da sidebar após carregar os dados (APENAS UM with st.sidebar)
 with st.sidebar:
+    # Recarregar invalida somente o conjunto de dados atual e o que foi derivado dele
+    if st.button("🔄 Recarregar Dados"):
+        cache_dados.invalidar(impressao)
+        st.rerun()
+    
+    if monitor is not None:
+        st.caption(f"📂 Pasta monitorada: {len(monitor['arquivos'])} arquivo(s)")
+        for nome, erro in monitor["erros"].items():
+            st.warning(f"{nome}: {erro}")
+    
+    # Com várias contas nos dados, analisar uma conta por vez
+    if "Conta" in df.columns:
+        conta_selecionada = st.selectbox("Selecione uma conta", df["Conta"].unique().tolist())
+        df_todas_contas = df
+        impressao = f"{impressao}/{conta_selecionada}"
+        df = cache_dados.obter(fonte, impressao, "dados",
+                               lambda: df_todas_contas[df_todas_contas["Conta"] == conta_selecionada]
+                               .reset_index(drop=True))
+    
     mes_selecionado = st.selectbox("Selecione um mês", df["Mês"].tolist())
+    
+    # Comparação entre dois intervalos de meses
+    # Sem data reconhecida em todos os meses, a ordem das linhas não é cronológica
+    if df["Data"].isna().any():
+        comparar_periodos = False
+        st.caption("Comparação de períodos indisponível: há meses sem data reconhecida.")
+    else:
+        comparar_periodos = st.checkbox("Comparar períodos")
+    if comparar_periodos:
+        meses = df["Mês"].tolist()
+        ultimo = len(meses) - 1
+        periodo_a = st.select_slider("Período A", options=range(len(meses)),
+                                     value=(ultimo, ultimo),
+                                     format_func=lambda i: meses[i])
+        periodo_b = st.select_slider("Período B", options=range(len(meses)),
+                                     value=(max(ultimo - 1, 0), max(ultimo - 1, 0)),
+                                     format_func=lambda i: meses[i])
+    
+    # Exportação dos dados processados (gerada só no clique e guardada no cache)
+    st.divider()
+    st.markdown("### Exportar Dados")
+    meses_exportacao = df["Mês"].tolist()
+    inicio_exportacao, fim_exportacao = st.select_slider(
+        "Período para exportação", options=range(len(meses_exportacao)),
+        value=(0, len(meses_exportacao) - 1),
+        format_func=lambda i: meses_exportacao[i])
+    sufixo_arquivo = f"{meses_exportacao[inicio_exportacao]}_{meses_exportacao[fim_exportacao]}".replace("/", "-")
+    for formato in exportar_dados.formatos_disponiveis(fim_exportacao - inicio_exportacao + 1):
+        extensao, mime = exportar_dados.FORMATOS[formato]
+        st.download_button(
+            label=f"📤 Exportar {formato}",
+            data=exportar_dados.preparar_exportacao(fonte, impressao, df, formato,
+                                                    inicio_exportacao, fim_exportacao),
+            file_name=f"instagram_dados_{sufixo_arquivo}.{extensao}",
+            mime=mime,
+        )
     st.divider()
     st.markdown("### Métricas Disponíveis")
     st.markdown("- Contas com Engajamento")
@@ -182,6 +220,20 @@ def formatar_numero(numero):
         return f"{numero/1000:.1f}k"
     return f"{numero}"
         
+# Função para somar as métricas de um intervalo de meses (posições inicio..fim, inclusivas)
+def somar_periodo(df, inicio, fim):
+    totais = {}
+    for col in colunas_comparacao:
+        acumulado = df[f"Acumulado {col}"]
+        anterior = acumulado.iat[inicio - 1] if inicio > 0 else 0
+        totais[col] = float(acumulado.iat[fim] - anterior)
+    # Taxa calculada sobre as somas do período, e não pela média das taxas mensais
+    if totais["Alcance"]:
+        totais["Taxa de Engajamento"] = (totais["Interações"] / totais["Alcance"]) * 100
+    else:
+        totais["Taxa de Engajamento"] = float("nan")
+    return totais
+
 # KPIs principais
 st.subheader("📈 Indicadores de Desempenho")
 col1, col2, col3, col4 = st.columns(4)
@@ -217,41 +269,64 @@ with col4:
     taxa_engaj = float(df_filtrado["Taxa de Engajamento"].values[0])
     st.metric("Taxa de Engajamento", f"{taxa_engaj:.2f}%")
 
-# Gráficos de tendência
+# Comparação de períodos (somas obtidas das colunas acumuladas, sem percorrer os dados)
+if comparar_periodos:
+    st.subheader("⚖️ Comparação de Períodos")
+    totais_a = somar_periodo(df, *periodo_a)
+    totais_b = somar_periodo(df, *periodo_b)
+    st.caption(f"Período A: {meses[periodo_a[0]]} a {meses[periodo_a[1]]} | "
+               f"Período B: {meses[periodo_b[0]]} a {meses[periodo_b[1]]}")
+    
+    colunas = st.columns(len(colunas_comparacao) + 1)
+    for coluna, metrica in zip(colunas, colunas_comparacao + ["Taxa de Engajamento"]):
+        valor_a = totais_a[metrica]
+        valor_b = totais_b[metrica]
+        if metrica == "Taxa de Engajamento":
+            valor_formatado = f"{valor_a:.2f}%" if not pd.isna(valor_a) else "-"
+        else:
+            valor_formatado = formatar_numero(int(valor_a))
+        with coluna:
+            if metrica == "Taxa de Engajamento" and not pd.isna(valor_a) and not pd.isna(valor_b):
+                st.metric(metrica, valor_formatado, f"{valor_a - valor_b:.2f} p.p. vs B")
+            elif valor_b and not pd.isna(valor_a) and not pd.isna(valor_b):
+                variacao = (valor_a - valor_b) / valor_b * 100
+                st.metric(metrica, valor_formatado, f"{variacao:.1f}% vs B")
+            else:
+                st.metric(metrica, valor_formatado, "")
+
+# Função para montar um gráfico de tendência destacando o mês selecionado
+def grafico_tendencia(df, coluna, titulo, cor, mes_selecionado):
+    fig = px.line(df, x="Mês", y=coluna, markers=True, 
+                  title=titulo,
+                  color_discrete_sequence=[cor])
+    fig.add_trace(go.Scatter(x=df["Mês"], y=df[coluna], 
+                             mode='lines', name='Tendência',
+                             line=dict(color=cor, dash='dash')))
+    # Destacar o mês selecionado
+    mes_idx = df.index[df["Mês"] == mes_selecionado].tolist()[0]
+    fig.add_trace(go.Scatter(x=[df.iloc[mes_idx]["Mês"]], 
+                             y=[df.iloc[mes_idx][coluna]],
+                             mode='markers',
+                             marker=dict(color='red', size=12),
+                             name=mes_selecionado))
+    return fig
+
+# Gráficos de tendência (guardados no cache do conjunto de dados, um por mês destacado)
 st.subheader("📉 Tendências Mensais")
 col1, col2 = st.columns(2)
 
 with col1:
     # Gráfico de seguidores com linha de tendência
-    fig1 = px.line(df, x="Mês", y="Seguidores", markers=True, 
-                 title="Crescimento de Seguidores",
-                 color_discrete_sequence=["seagreen"])
-    fig1.add_trace(go.Scatter(x=df["Mês"], y=df["Seguidores"], 
-                          mode='lines', name='Tendência',
-                          line=dict(color='seagreen', dash='dash')))
-    # Destacar o mês selecionado
-    mes_idx = df.index[df["Mês"] == mes_selecionado].tolist()[0]
-    fig1.add_trace(go.Scatter(x=[df.iloc[mes_idx]["Mês"]], 
-                              y=[df.iloc[mes_idx]["Seguidores"]],
-                              mode='markers',
-                              marker=dict(color='red', size=12),
-                              name=mes_selecionado))
+    fig1 = cache_dados.obter(fonte, impressao, f"grafico_seguidores:{mes_selecionado}",
+                             lambda: grafico_tendencia(df, "Seguidores", "Crescimento de Seguidores",
+                                                       "seagreen", mes_selecionado))
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
     # Gráfico de alcance
-    fig2 = px.line(df, x="Mês", y="Alcance", markers=True,
-                 title="Evolução do Alcance",
-                 color_discrete_sequence=["royalblue"])
-    fig2.add_trace(go.Scatter(x=df["Mês"], y=df["Alcance"], 
-                          mode='lines', name='Tendência',
-                          line=dict(color='royalblue', dash='dash')))
-    # Destacar o mês selecionado
-    fig2.add_trace(go.Scatter(x=[df.iloc[mes_idx]["Mês"]], 
-                              y=[df.iloc[mes_idx]["Alcance"]],
-                              mode='markers',
-                              marker=dict(color='red', size=12),
-                              name=mes_selecionado))
+    fig2 = cache_dados.obter(fonte, impressao, f"grafico_alcance:{mes_selecionado}",
+                             lambda: grafico_tendencia(df, "Alcance", "Evolução do Alcance",
+                                                       "royalblue", mes_selecionado))
     st.plotly_chart(fig2, use_container_width=True)
 
 # Gráfico de barras de engajamento
@@ -260,23 +335,36 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Comparativo de interações
-    fig3 = px.bar(df, x="Mês", y=["Curtidas", "Comentários"], 
-                title="Interações por Mês",
-                barmode='group')
+    fig3 = cache_dados.obter(fonte, impressao, "grafico_interacoes",
+                             lambda: px.bar(df, x="Mês", y=["Curtidas", "Comentários"], 
+                                            title="Interações por Mês",
+                                            barmode='group'))
     st.plotly_chart(fig3, use_container_width=True)
 
 with col2:
     # Taxa de engajamento
-    fig4 = px.line(df, x="Mês", y="Taxa de Engajamento", markers=True,
-                 title="Taxa de Engajamento (%)",
-                 color_discrete_sequence=["crimson"])
+    fig4 = cache_dados.obter(fonte, impressao, "grafico_taxa_engajamento",
+                             lambda: px.line(df, x="Mês", y="Taxa de Engajamento", markers=True,
+                                             title="Taxa de Engajamento (%)",
+                                             color_discrete_sequence=["crimson"]))
     st.plotly_chart(fig4, use_container_width=True)
 
 # Tabela de dados detalhados
 st.subheader("📌 Dados Detalhados")
 colunas_exibir = ["Mês", "Seguidores", "Alcance", "Contas com Engajamento", 
                  "Taxa de Engajamento", "Interações", "Curtidas", "Comentários"]
-st.dataframe(df[colunas_exibir], use_container_width=True)
+tabela_detalhada = cache_dados.obter(fonte, impressao, "tabela_detalhada", lambda: df[colunas_exibir])
+st.dataframe(tabela_detalhada, use_container_width=True)
+
+# Visão de administração do cache (abrir com ?admin=<token> na URL; o token vem da
+# variável de ambiente BI_TOKEN_ADMIN e, sem ela, a visão fica desativada)
+if cache_dados.admin_autorizado(st.query_params.get("admin")):
+    st.subheader("🛠️ Cache de Dados")
+    entradas = cache_dados.listar_entradas()
+    st.caption(f"{len(entradas)} entradas | {entradas['Tamanho (KB)'].sum():.1f} KB no total | "
+               "Conjunto: impressão digital dos dados enviados ou da pasta monitorada, "
+               "ou \"padrao:<dashboard>\" para os dados padrão")
+    st.dataframe(entradas, use_container_width=True)
 
 # Rodapé
 st.divider()
@@ -0,0 +1,174 @@
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Tempo de vida (segundos) das entradas de cada fonte de dados
+TTL_POR_FONTE = {
+    "padrao": 24 * 60 * 60,
+    "upload": 60 * 60,
+    "diretorio": 6 * 60 * 60,
+}
+
+# Limites do cache: ao passar de qualquer um, saem as entradas usadas há mais tempo (LRU)
+LIMITE_ENTRADAS = 500
+LIMITE_BYTES = 512 * 1024 * 1024
+
+# Intervalo mínimo (segundos) entre varreduras de entradas vencidas feitas nas leituras
+INTERVALO_LIMPEZA = 60
+
+# Registro único por processo, compartilhado por todas as sessões (e pelas threads de
+# leitura e do monitor, que não têm contexto do Streamlit). A ordem do OrderedDict é a
+# ordem de uso: a entrada mais antiga fica no início
+_entradas = OrderedDict()
+_trava = threading.Lock()
+_ultima_limpeza = 0.0
+
+
+# Função para gerar a impressão digital (hash do conteúdo) de uma fonte de dados
+def impressao_digital(conteudo):
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode("utf-8")
+    return hashlib.sha256(conteudo).hexdigest()[:16]
+
+
+# Função para verificar o token da visão de administração (variável BI_TOKEN_ADMIN);
+# sem a variável definida a visão fica desativada
+def admin_autorizado(token):
+    esperado = os.environ.get("BI_TOKEN_ADMIN")
+    if not esperado or not token:
+        return False
+    return hmac.compare_digest(str(token).encode("utf-8"), esperado.encode("utf-8"))
+
+
+# Função para estimar o tamanho em memória de um valor guardado no cache
+# (DataFrames, bytes e os vetores de dados das figuras do Plotly; o resto é medido raso)
+def _tamanho(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, tuple):
+        return sum(_tamanho(item) for item in valor)
+    if hasattr(valor, "to_plotly_json"):
+        return sys.getsizeof(valor) + sum(_tamanho_traco(traco) for traco in valor.data)
+    return sys.getsizeof(valor)
+
+
+# Função para medir um traço de figura: os vetores (x, y, textos...) carregam os dados
+def _tamanho_traco(traco):
+    total = 0
+    for atributo in traco.to_plotly_json().values():
+        if isinstance(atributo, (list, tuple)) or hasattr(atributo, "dtype"):
+            total += int(pd.Series(atributo).memory_usage(deep=True, index=False))
+        else:
+            total += sys.getsizeof(atributo)
+    return total
+
+
+def _expirada(entrada, agora):
+    return entrada["ttl"] is not None and agora - entrada["criado_em"] > entrada["ttl"]
+
+
+# Remove as entradas vencidas (chamada com a trava adquirida)
+def _limpar_expiradas(agora):
+    global _ultima_limpeza
+    _ultima_limpeza = agora
+    for chave in [c for c, e in _entradas.items() if _expirada(e, agora)]:
+        del _entradas[chave]
+
+
+# Remove as entradas usadas há mais tempo até respeitar os limites (chamada com a trava adquirida)
+def _aplicar_limites():
+    total = sum(e["tamanho"] for e in _entradas.values())
+    while _entradas and (len(_entradas) > LIMITE_ENTRADAS or total > LIMITE_BYTES):
+        _, entrada = _entradas.popitem(last=False)
+        total -= entrada["tamanho"]
+
+
+# Função para buscar um valor no cache; devolve (encontrado, valor)
+def buscar(fonte, impressao, nome):
+    chave = (fonte, impressao, nome)
+    agora = time.time()
+
+    with _trava:
+        if agora - _ultima_limpeza > INTERVALO_LIMPEZA:
+            _limpar_expiradas(agora)
+        entrada = _entradas.get(chave)
+        if entrada is None:
+            return False, None
+        if _expirada(entrada, agora):
+            del _entradas[chave]
+            return False, None
+        entrada["ultimo_acesso"] = agora
+        entrada["acessos"] += 1
+        _entradas.move_to_end(chave)
+        return True, entrada["valor"]
+
+
+# Função para guardar um valor no cache (o tamanho é medido antes de pegar a trava,
+# que é compartilhada por todas as sessões)
+def guardar(fonte, impressao, nome, valor):
+    tamanho = _tamanho(valor)
+    agora = time.time()
+    with _trava:
+        _limpar_expiradas(agora)
+        _entradas[(fonte, impressao, nome)] = {
+            "valor": valor,
+            "criado_em": agora,
+            "ultimo_acesso": agora,
+            "acessos": 1,
+            "tamanho": tamanho,
+            "ttl": TTL_POR_FONTE.get(fonte),
+        }
+        _entradas.move_to_end((fonte, impressao, nome))
+        _aplicar_limites()
+    return valor
+
+
+# Função para buscar um valor no cache ou calculá-lo (resultados None não são guardados)
+def obter(fonte, impressao, nome, calcular):
+    encontrado, valor = buscar(fonte, impressao, nome)
+    if encontrado:
+        return valor
+
+    valor = calcular()
+    if valor is None:
+        return None
+    return guardar(fonte, impressao, nome, valor)
+
+
+# Função para invalidar apenas um conjunto de dados (e figuras/tabelas derivadas dele,
+# inclusive as visões por conta, guardadas como "<impressao>/<conta>")
+def invalidar(impressao):
+    with _trava:
+        chaves = [c for c in _entradas if c[1] == impressao or c[1].startswith(impressao + "/")]
+        for chave in chaves:
+            del _entradas[chave]
+    return len(chaves)
+
+
+# Função para listar as entradas do cache (visão de administração)
+def listar_entradas():
+    agora = time.time()
+    with _trava:
+        linhas = [
+            {
+                "Fonte": fonte,
+                "Conjunto": conjunto,
+                "Item": nome,
+                "Tamanho (KB)": round(entrada["tamanho"] / 1024, 1),
+                "Acessos": entrada["acessos"],
+                "Criado em": pd.to_datetime(entrada["criado_em"], unit="s"),
+                "Último Acesso": pd.to_datetime(entrada["ultimo_acesso"], unit="s"),
+                "Expirado": _expirada(entrada, agora),
+            }
+            for (fonte, conjunto, nome), entrada in _entradas.items()
+        ]
+    return pd.DataFrame(linhas, columns=["Fonte", "Conjunto", "Item", "Tamanho (KB)",
+                                         "Acessos", "Criado em", "Último Acesso", "Expirado"])
@@ -0,0 +1,63 @@
+import importlib.util
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cache_dados
+
+# Formatos de exportação: extensão e tipo MIME
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Limite de linhas de uma planilha do Excel (inclui a linha de cabeçalho)
+LIMITE_LINHAS_XLSX = 1_048_576
+
+
+# Função para listar os formatos disponíveis para uma exportação de `linhas` linhas
+# (XLSX depende do openpyxl e do limite de linhas do Excel)
+def formatos_disponiveis(linhas=0):
+    if importlib.util.find_spec("openpyxl") is None or linhas + 1 > LIMITE_LINHAS_XLSX:
+        return [f for f in FORMATOS if f != "XLSX"]
+    return list(FORMATOS)
+
+
+# Função para selecionar as linhas e colunas exportadas
+# (sem as colunas internas: acumulados e a data usada na ordenação)
+def filtrar_dados(df, inicio, fim):
+    colunas = [col for col in df.columns if col != "Data" and not col.startswith("Acumulado ")]
+    return df.iloc[inicio:fim + 1][colunas]
+
+
+# Função para serializar os dados no formato escolhido. O arquivo inteiro é montado
+# em memória (o download do Streamlit recebe os bytes prontos, não há streaming)
+def gerar_bytes(df, formato):
+    buffer = io.BytesIO()
+
+    if formato == "CSV":
+        df.to_csv(buffer, index=False, encoding="utf-8")
+    elif formato == "Parquet":
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    elif formato == "XLSX":
+        if len(df) + 1 > LIMITE_LINHAS_XLSX:
+            raise ValueError(f"XLSX suporta no máximo {LIMITE_LINHAS_XLSX - 1:,} linhas de dados; "
+                             f"o período selecionado tem {len(df):,}")
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="Dados")
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    return buffer.getvalue()
+
+
+# Função que devolve o gerador preguiçoso do arquivo: só serializa no clique,
+# e guarda o resultado no cache pela impressão digital do conjunto + filtro
+def preparar_exportacao(fonte, impressao, df, formato, inicio, fim):
+    def gerar():
+        return cache_dados.obter(fonte, impressao, f"exportacao_{formato.lower()}:{inicio}-{fim}",
+                                 lambda: gerar_bytes(filtrar_dados(df, inicio, fim), formato))
+    return gerar
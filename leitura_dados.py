@@ -0,0 +1,177 @@
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+import cache_dados
+
+# Limite de arquivos lidos ao mesmo tempo
+MAX_LEITURAS_PARALELAS = 8
+
+
+# Mapear nomes de meses para datas reais para ordenação correta
+meses_mapeamento = {
+    # 2023
+    "Dez/23": datetime(2023, 12, 1),
+    "Dezembro": datetime(2023, 12, 1),
+    "Dezembro 2023": datetime(2023, 12, 1),
+    
+    # 2024
+    "Jan/24": datetime(2024, 1, 1),
+    "Janeiro": datetime(2024, 1, 1),
+    "Janeiro 2024": datetime(2024, 1, 1),
+    
+    "Fev/24": datetime(2024, 2, 1),
+    "Fevereiro": datetime(2024, 2, 1),
+    "Fevereiro 2024": datetime(2024, 2, 1),
+    
+    "Mar/24": datetime(2024, 3, 1),
+    "Março": datetime(2024, 3, 1),
+    "Março 2024": datetime(2024, 3, 1),
+    
+    "Abr/24": datetime(2024, 4, 1),
+    "Abril": datetime(2024, 4, 1),
+    "Abril 2024": datetime(2024, 4, 1),
+    
+    "Mai/24": datetime(2024, 5, 1),
+    "Maio": datetime(2024, 5, 1),
+    "Maio 2024": datetime(2024, 5, 1),
+    
+    "Jun/24": datetime(2024, 6, 1),
+    "Junho": datetime(2024, 6, 1),
+    "Junho 2024": datetime(2024, 6, 1),
+    
+    "Jul/24": datetime(2024, 7, 1),
+    "Julho": datetime(2024, 7, 1),
+    "Julho 2024": datetime(2024, 7, 1),
+    
+    "Ago/24": datetime(2024, 8, 1),
+    "Agosto": datetime(2024, 8, 1),
+    "Agosto 2024": datetime(2024, 8, 1),
+    
+    "Set/24": datetime(2024, 9, 1),
+    "Setembro": datetime(2024, 9, 1),
+    "Setembro 2024": datetime(2024, 9, 1),
+    
+    "Out/24": datetime(2024, 10, 1),
+    "Outubro": datetime(2024, 10, 1),
+    "Outubro 2024": datetime(2024, 10, 1),
+    
+    "Nov/24": datetime(2024, 11, 1),
+    "Novembro": datetime(2024, 11, 1),
+    "Novembro 2024": datetime(2024, 11, 1),
+    
+    "Dez/24": datetime(2024, 12, 1),
+    "Dezembro 2024": datetime(2024, 12, 1)
+}
+
+
+# Abreviações dos meses em português, para converter rótulos como "Mar/25" ou "Março 2025"
+abreviacoes_meses = {"jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6,
+                     "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12}
+
+
+# Função para converter um rótulo de mês com ano (ex.: "Mar/25", "Mar/2025", "Março 2025") em data
+def converter_mes(rotulo):
+    partes = re.split(r"[/\s-]+", str(rotulo).strip())
+    if len(partes) != 2 or not partes[1].isdigit():
+        return pd.NaT
+    mes = abreviacoes_meses.get(partes[0][:3].lower())
+    ano = int(partes[1])
+    if mes is None or len(partes[1]) not in (2, 4):
+        return pd.NaT
+    return datetime(ano + 2000 if ano < 100 else ano, mes, 1)
+
+
+# Função para converter uma série de rótulos de mês em datas (NaT quando não reconhecido);
+# rótulos fora do mapeamento, como os meses de 2025, são convertidos pelo nome e ano
+def converter_datas(meses):
+    return pd.to_datetime(meses.map(meses_mapeamento).fillna(meses.map(converter_mes)))
+
+
+# Função para ler um arquivo (CSV ou Parquet) e validar as colunas necessárias
+def ler_arquivo(nome, conteudo, colunas_necessarias):
+    if nome.lower().endswith(".parquet"):
+        df = pd.read_parquet(io.BytesIO(conteudo))
+    else:
+        df = pd.read_csv(io.BytesIO(conteudo))
+
+    colunas_faltantes = [col for col in colunas_necessarias if col not in df.columns]
+    if colunas_faltantes:
+        raise ValueError(f"Colunas faltantes: {', '.join(colunas_faltantes)}")
+    if "Conta" in df.columns and df["Conta"].isna().any():
+        raise ValueError("Coluna Conta com valores vazios")
+    sem_data = df.loc[converter_datas(df["Mês"]).isna(), "Mês"].astype(str).unique()
+    if len(sem_data):
+        raise ValueError(f"Meses sem data reconhecida: {', '.join(sem_data)}")
+    return df
+
+
+# Função para ler um arquivo sem propagar o erro: devolve (df, erro).
+# Roda nas threads de leitura, por isso não usa o cache nem o Streamlit
+def _ler(nome, conteudo, colunas_necessarias):
+    try:
+        return ler_arquivo(nome, conteudo, colunas_necessarias), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Função para verificar se todos os arquivos válidos concordam sobre a coluna "Conta":
+# se algum arquivo tem a coluna, os que não têm são recusados. Recebe (nome, df) e
+# devolve {nome: erro} dos arquivos recusados
+def verificar_contas(arquivos):
+    if not any("Conta" in df.columns for _, df in arquivos):
+        return {}
+    return {nome: "Sem a coluna Conta, presente nos demais arquivos"
+            for nome, df in arquivos if "Conta" not in df.columns}
+
+
+# Função para ler vários arquivos; cada arquivo é validado separadamente.
+# Recebe uma lista de (nome, impressao, ler_conteudo), em que ler_conteudo é chamado só
+# para os arquivos fora do cache, e devolve (nome, impressao, df, erro) na mesma ordem.
+# O cache é consultado e atualizado aqui (na thread do script); só a leitura dos
+# arquivos que não estão no cache roda em paralelo. Erros também ficam no cache, e a
+# chave inclui a extensão e as colunas exigidas, que mudam o resultado da validação
+def ler_arquivos(arquivos, colunas_necessarias):
+    validacao = cache_dados.impressao_digital("|".join(colunas_necessarias))
+    resultados, pendentes = [], []
+    for nome, impressao, ler_conteudo in arquivos:
+        chave = f"arquivo:{os.path.splitext(nome)[1].lower()}:{validacao}"
+        encontrado, lido = cache_dados.buscar("upload", impressao, chave)
+        conteudo = None
+        if not encontrado:
+            pendentes.append(len(resultados))
+            conteudo = ler_conteudo()
+        resultados.append([nome, impressao, chave, conteudo, lido])
+
+    def ler(i):
+        return _ler(resultados[i][0], resultados[i][3], colunas_necessarias)
+
+    if len(pendentes) <= 1:
+        lidos = [ler(i) for i in pendentes]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(pendentes), MAX_LEITURAS_PARALELAS)) as executor:
+            lidos = list(executor.map(ler, pendentes))
+    for i, lido in zip(pendentes, lidos):
+        _, impressao, chave, _, _ = resultados[i]
+        resultados[i][3] = None
+        resultados[i][4] = cache_dados.guardar("upload", impressao, chave, lido)
+
+    inconsistentes = verificar_contas([(nome, lido[0]) for nome, _, _, _, lido in resultados
+                                       if lido[0] is not None])
+    return [(nome, impressao, None, inconsistentes[nome]) if nome in inconsistentes
+            else (nome, impressao, df, erro)
+            for nome, impressao, _, _, (df, erro) in resultados]
+
+
+# Função para juntar os arquivos de uma vez e remover períodos repetidos (por conta e
+# data, quando houver a coluna "Conta"; "Mar/24" e "Março 2024" são o mesmo período);
+# vale o último arquivo
+def combinar(frames):
+    combinado = pd.concat(frames, ignore_index=True)
+    combinado["Data"] = converter_datas(combinado["Mês"])
+    chaves = ["Conta", "Data"] if "Conta" in combinado.columns else ["Data"]
+    return combinado.drop_duplicates(chaves, keep="last").reset_index(drop=True)
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+import streamlit as st
+
+import cache_dados
+import leitura_dados
+
+# Extensões aceitas na pasta monitorada e intervalo entre verificações (segundos)
+EXTENSOES = (".csv", ".parquet")
+INTERVALO_VERIFICACAO = 5
+
+
+# Função para iniciar (uma vez por processo) o monitor da pasta de dados. A pasta é
+# verificada fora do cache: se ainda não existir, a próxima execução tenta de novo
+def iniciar(pasta, colunas_necessarias, processar):
+    if not pasta or not os.path.isdir(pasta):
+        return None
+    return _iniciar(pasta, tuple(colunas_necessarias), processar)
+
+
+@st.cache_resource
+def _iniciar(pasta, colunas_necessarias, _processar):
+    estado = {
+        "pasta": pasta,
+        "arquivos": {},
+        "erros": {},
+        "atual": None,
+        "atualizado_em": None,
+        "erros_publicacao": {},
+    }
+    threading.Thread(target=_monitorar, args=(estado, colunas_necessarias, _processar),
+                     name=f"monitor-dados:{pasta}", daemon=True).start()
+    return estado
+
+
+# Função para obter o conjunto de dados publicado mais recente: (impressao, df) ou None
+def dados_publicados(estado):
+    if estado is None:
+        return None
+    return estado["atual"]
+
+
+def _monitorar(estado, colunas_necessarias, processar):
+    while True:
+        try:
+            _verificar(estado, colunas_necessarias, processar)
+        except Exception as e:
+            # Novo dicionário trocado de uma vez: as sessões podem estar percorrendo o atual
+            estado["erros"] = {**estado["erros"], estado["pasta"]: str(e)}
+        time.sleep(INTERVALO_VERIFICACAO)
+
+
+# Função para detectar arquivos novos/alterados (mtime + hash) e republicar se algo mudou
+def _verificar(estado, colunas_necessarias, processar):
+    anteriores = estado["arquivos"]
+    arquivos = {}
+    erros = {}
+    mudou = False
+
+    for entrada in os.scandir(estado["pasta"]):
+        if not entrada.is_file() or not entrada.name.lower().endswith(EXTENSOES):
+            continue
+
+        info = entrada.stat()
+        anterior = anteriores.get(entrada.path)
+        # Mesmo mtime e tamanho: arquivo não mudou, nem é preciso ler o conteúdo
+        if anterior and anterior["mtime"] == info.st_mtime_ns and anterior["tamanho"] == info.st_size:
+            arquivos[entrada.path] = anterior
+            if anterior["erro"]:
+                erros[entrada.name] = anterior["erro"]
+            continue
+
+        with open(entrada.path, "rb") as f:
+            conteudo = f.read()
+        impressao = cache_dados.impressao_digital(conteudo)
+
+        # mtime mudou mas o conteúdo é o mesmo: só atualizar os metadados
+        if anterior and anterior["impressao"] == impressao:
+            arquivos[entrada.path] = {**anterior, "mtime": info.st_mtime_ns, "tamanho": info.st_size}
+            if anterior["erro"]:
+                erros[entrada.name] = anterior["erro"]
+            continue
+
+        try:
+            df, erro = leitura_dados.ler_arquivo(entrada.name, conteudo, colunas_necessarias), None
+        except Exception as e:
+            df, erro = None, str(e)
+            erros[entrada.name] = erro
+
+        arquivos[entrada.path] = {
+            "mtime": info.st_mtime_ns,
+            "tamanho": info.st_size,
+            "impressao": impressao,
+            "df": df,
+            "erro": erro,
+        }
+        mudou = True
+
+    if mudou or arquivos.keys() != anteriores.keys():
+        estado["erros_publicacao"] = _publicar(estado, arquivos, processar)
+    # Falhas da combinação e do processamento continuam sendo exibidas até algum arquivo mudar
+    erros.update(estado["erros_publicacao"])
+    estado["arquivos"] = arquivos
+    estado["erros"] = erros
+
+
+# Função para combinar os arquivos válidos e trocar o conjunto publicado de uma só vez.
+# Roda na thread do monitor (sem contexto do Streamlit): o processamento não pode usar
+# st.* e, se falhar ou não gerar linhas, o conjunto anterior continua publicado.
+# Devolve os erros ({nome: erro}): arquivos recusados na combinação e falha do processamento
+def _publicar(estado, arquivos, processar):
+    validos = sorted(((os.path.basename(caminho), a) for caminho, a in arquivos.items() if a["df"] is not None),
+                     key=lambda item: item[1]["mtime"])
+    erros = leitura_dados.verificar_contas([(nome, a["df"]) for nome, a in validos])
+    validos = [a for nome, a in validos if nome not in erros]
+    if not validos:
+        novo = None
+    else:
+        # Em períodos repetidos vale o arquivo mais recente
+        impressao = cache_dados.impressao_digital("".join(a["impressao"] for a in validos))
+        try:
+            df = processar(leitura_dados.combinar([a["df"] for a in validos]))
+        except Exception as e:
+            return {**erros, estado["pasta"]: f"Erro ao processar dados: {e}"}
+        if df is None or df.empty:
+            return {**erros, estado["pasta"]: "Erro ao processar dados: nenhuma linha válida"}
+        novo = (impressao, df)
+
+    antigo = estado["atual"]
+    estado["atual"] = novo
+    estado["atualizado_em"] = time.time()
+    if antigo is not None and (novo is None or antigo[0] != novo[0]):
+        cache_dados.invalidar(antigo[0])
+    return erros
@@ -0,0 +1,354 @@
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+# Teste de carga local: sobe o app com `streamlit run` numa porta livre e simula N
+# navegadores simultâneos com um cliente headless (o mesmo protocolo websocket do
+# navegador). Mede a latência de cada interação até o fim da execução do script e a
+# memória residente do processo do servidor. Não usa rede externa. Termina com código 1
+# se alguma interação tiver erro (exceto com --permitir-erros) ou se o p95 passar de
+# --limite-p95.
+#
+# Exemplo:
+#   python teste_carga.py PARANAapp.py --sessoes 20 --iteracoes 3 --limite-p95 500
+
+PASTA_APPS = os.path.dirname(os.path.abspath(__file__))
+APPS_DASHBOARD = ["PARANAapp.py", "NAINDRAapp.py"]
+APP_CALCULADORA = "CalculadoraCilindrada.py"
+MESES = ["Jan/24", "Fev/24", "Mar/24", "Abr/24", "Mai/24", "Jun/24",
+         "Jul/24", "Ago/24", "Set/24", "Out/24", "Nov/24", "Dez/24"]
+
+
+# Cliente headless: uma sessão do Streamlit vista pelo lado do navegador
+class SessaoSimulada:
+    def __init__(self, ws, url, timeout):
+        self.ws = ws
+        self.url = url
+        self.timeout = timeout
+        self.sessao_id = None
+        self.pagina = ""
+        self.estados = {}
+        self.widgets = {}
+        self.alertas = []
+        self.mensagens_cache = {}
+
+    def _receber(self):
+        msg = ForwardMsg()
+        msg.ParseFromString(self.ws.recv(timeout=self.timeout))
+        # Mensagens já enviadas a esta sessão chegam só como referência ao hash
+        if msg.WhichOneof("type") == "ref_hash":
+            msg = self.mensagens_cache.get(msg.ref_hash, msg)
+        elif msg.metadata.cacheable:
+            self.mensagens_cache[msg.hash] = msg
+        return msg
+
+    # Função para executar o script com o estado atual dos widgets; retorna True se houve exceção
+    def executar(self, gatilho=None):
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.page_script_hash = self.pagina
+        back.rerun_script.widget_states.widgets.extend(self.estados.values())
+        if gatilho is not None:
+            back.rerun_script.widget_states.widgets.append(WidgetState(id=gatilho, trigger_value=True))
+        self.ws.send(back.SerializeToString())
+
+        widgets, alertas, excecao = {}, [], False
+        while True:
+            msg = self._receber()
+            tipo = msg.WhichOneof("type")
+            if tipo == "new_session":
+                self.sessao_id = msg.new_session.initialize.session_id
+                self.pagina = msg.new_session.page_script_hash
+            elif tipo == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                elemento = msg.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                if tipo_elemento == "exception":
+                    excecao = True
+                elif tipo_elemento == "alert":
+                    alertas.append(elemento.alert.body)
+                proto = getattr(elemento, tipo_elemento)
+                if getattr(proto, "id", "") and getattr(proto, "label", ""):
+                    widgets[proto.label] = proto
+            elif tipo == "script_finished":
+                # st.rerun() encerra a execução e inicia outra em seguida
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+                widgets, alertas = {}, []
+        self.widgets = widgets
+        self.alertas = alertas
+        return excecao
+
+    def selecionar(self, rotulo, valor):
+        widget_id = self.widgets[rotulo].id
+        self.estados[widget_id] = WidgetState(id=widget_id, string_value=valor)
+        return self.executar()
+
+    def digitar(self, rotulo, texto):
+        widget_id = self.widgets[rotulo].id
+        self.estados[widget_id] = WidgetState(id=widget_id, string_value=texto)
+
+    def clicar(self, rotulo):
+        return self.executar(gatilho=self.widgets[rotulo].id)
+
+    # Função para enviar arquivos [(nome, conteudo), ...]: pede as URLs de upload,
+    # envia cada arquivo por HTTP e reexecuta com todos no mesmo widget
+    def enviar_arquivos(self, rotulo, arquivos):
+        back = BackMsg()
+        back.file_urls_request.request_id = uuid.uuid4().hex
+        back.file_urls_request.file_names.extend(nome for nome, _ in arquivos)
+        back.file_urls_request.session_id = self.sessao_id
+        self.ws.send(back.SerializeToString())
+        while True:
+            msg = self._receber()
+            if (msg.WhichOneof("type") == "file_urls_response"
+                    and msg.file_urls_response.response_id == back.file_urls_request.request_id):
+                break
+
+        widget_id = self.widgets[rotulo].id
+        estado = WidgetState(id=widget_id)
+        for (nome, conteudo), urls in zip(arquivos, msg.file_urls_response.file_urls):
+            resposta = requests.put(self.url + urls.upload_url, files={"file": (nome, conteudo)},
+                                    timeout=self.timeout)
+            resposta.raise_for_status()
+            info = estado.file_uploader_state_value.uploaded_file_info.add()
+            info.name, info.size, info.file_id = nome, len(conteudo), urls.file_id
+            info.file_urls.CopyFrom(urls)
+        self.estados[widget_id] = estado
+        return self.executar()
+
+
+# Função para gerar um CSV diferente por sessão (cada usuário envia seus próprios dados);
+# com `contas`, cada mês tem uma linha por conta na coluna "Conta"
+def gerar_csv(semente, meses=MESES, contas=None):
+    aleatorio = random.Random(semente)
+    seguidores = aleatorio.randint(500, 10000)
+    linhas = []
+    for mes in meses:
+        for conta in contas or [None]:
+            seguidores += aleatorio.randint(0, 300)
+            curtidas = aleatorio.randint(50, 500)
+            comentarios = aleatorio.randint(0, 50)
+            linhas.append({
+                **({"Conta": conta} if conta else {}),
+                "Mês": mes,
+                "Contas com Engajamento": aleatorio.randint(50, 500),
+                "Seguidores": seguidores,
+                "Alcance": aleatorio.randint(1000, 200000),
+                "Interações": curtidas + comentarios + aleatorio.randint(0, 100),
+                "Curtidas": curtidas,
+                "Comentários": comentarios,
+                "Visualizações": aleatorio.randint(2000, 500000),
+            })
+    return pd.DataFrame(linhas).to_csv(index=False).encode("utf-8")
+
+
+# Função para medir uma interação; é erro se ela falhar ou se o app exibir uma exceção
+def medir(resultados, trava, interacao, acao):
+    inicio = time.perf_counter()
+    try:
+        erro = bool(acao())
+    except Exception:
+        erro = True
+    duracao = (time.perf_counter() - inicio) * 1000
+    with trava:
+        resultados.append({"Interação": interacao, "Latência (ms)": duracao, "Erro": erro})
+
+
+# Roteiro de uma sessão de dashboard: abrir, enviar um CSV e percorrer os meses; depois
+# enviar um CSV por mês com duas contas e percorrer as contas
+def sessao_dashboard(sessao, iteracoes, resultados, trava):
+    medir(resultados, trava, "carregar", sessao.executar)
+    for i in range(iteracoes):
+        semente = f"{id(sessao)}-{i}"
+
+        def enviar_unico():
+            erro = sessao.enviar_arquivos("Carregar arquivos CSV", [("dados.csv", gerar_csv(semente))])
+            return erro or list(sessao.widgets["Selecione um mês"].options) != MESES
+
+        medir(resultados, trava, "upload", enviar_unico)
+        for mes in list(sessao.widgets["Selecione um mês"].options):
+            medir(resultados, trava, "trocar_mes", lambda: sessao.selecionar("Selecione um mês", mes))
+
+        contas = [f"conta_{semente}_a", f"conta_{semente}_b"]
+
+        def enviar_mensais():
+            arquivos = [(f"dados_{mes.replace('/', '-')}.csv", gerar_csv(f"{semente}-{mes}", [mes], contas))
+                        for mes in MESES]
+            erro = sessao.enviar_arquivos("Carregar arquivos CSV", arquivos)
+            conta = sessao.widgets.get("Selecione uma conta")
+            return erro or conta is None or sorted(conta.options) != contas
+
+        medir(resultados, trava, "upload_multiplo", enviar_mensais)
+        for conta in list(sessao.widgets["Selecione uma conta"].options):
+            medir(resultados, trava, "trocar_conta", lambda: sessao.selecionar("Selecione uma conta", conta))
+
+
+# Roteiro de uma sessão da calculadora: registrar, entrar e calcular
+def sessao_calculadora(sessao, iteracoes, resultados, trava):
+    medir(resultados, trava, "carregar", sessao.executar)
+    usuario, senha = f"carga_{uuid.uuid4().hex[:12]}", "senha123"
+
+    def registrar():
+        sessao.digitar("Novo Usuário", usuario)
+        sessao.digitar("Nova Senha", senha)
+        sessao.digitar("Confirmar Senha", senha)
+        erro = sessao.clicar("Registrar")
+        return erro or "Usuário registrado com sucesso!" not in sessao.alertas
+
+    def entrar():
+        sessao.digitar("Usuário", usuario)
+        sessao.digitar("Senha", senha)
+        erro = sessao.clicar("Entrar")
+        return erro or "Calcular Cilindrada" not in sessao.widgets
+
+    medir(resultados, trava, "registrar", registrar)
+    medir(resultados, trava, "login", entrar)
+    for _ in range(iteracoes):
+        medir(resultados, trava, "calcular", lambda: sessao.clicar("Calcular Cilindrada"))
+
+
+# Função para executar o roteiro de uma sessão; falhas fora de `medir` (conexão recusada
+# ou expirada, widget ausente após uma interação com erro) encerram só esta sessão e
+# entram no relatório como um erro de "sessão"
+def executar_roteiro(roteiro, url, iteracoes, timeout, resultados, trava):
+    inicio = time.perf_counter()
+    try:
+        with connect(url.replace("http", "ws", 1) + "/_stcore/stream", subprotocols=["streamlit"],
+                     origin=url, max_size=None, open_timeout=timeout) as ws:
+            roteiro(SessaoSimulada(ws, url, timeout), iteracoes, resultados, trava)
+    except Exception:
+        duracao = (time.perf_counter() - inicio) * 1000
+        with trava:
+            resultados.append({"Interação": "sessão", "Latência (ms)": duracao, "Erro": True})
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Função para subir o app com `streamlit run` e esperar o servidor responder
+def iniciar_servidor(app, pasta_trabalho, timeout):
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(PASTA_APPS, app),
+         "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(porta),
+         "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=pasta_trabalho, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor do {app} encerrou ao iniciar")
+        try:
+            if requests.get(url + "/_stcore/health", timeout=1).ok:
+                return processo, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f"O servidor do {app} não respondeu em {timeout:.0f}s")
+
+
+# Função para ler a memória residente (MB) de um processo; None fora do Linux
+def memoria_processo(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Função para acompanhar o pico de memória do servidor enquanto o teste roda
+def monitorar_memoria(pid, amostras, parar):
+    while not parar.is_set():
+        rss = memoria_processo(pid)
+        if rss is not None:
+            amostras.append(rss)
+        parar.wait(0.2)
+
+
+# Função para resumir as medições por interação (vazão e percentis de latência)
+def resumir(resultados, duracao_total):
+    df = pd.DataFrame(resultados)
+    resumo = df.groupby("Interação")["Latência (ms)"].describe(percentiles=[0.5, 0.95, 0.99])
+    resumo = resumo.rename(columns={"count": "Execuções", "50%": "p50", "95%": "p95", "99%": "p99",
+                                    "max": "máx"})[["Execuções", "p50", "p95", "p99", "máx"]]
+    resumo["Erros"] = df.groupby("Interação")["Erro"].sum()
+    resumo["Vazão (/s)"] = resumo["Execuções"] / duracao_total
+    return resumo.round(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga local dos apps Streamlit")
+    parser.add_argument("app", choices=APPS_DASHBOARD + [APP_CALCULADORA])
+    parser.add_argument("--sessoes", type=int, default=10, help="sessões simultâneas")
+    parser.add_argument("--iteracoes", type=int, default=2, help="repetições do roteiro por sessão")
+    parser.add_argument("--timeout", type=float, default=60, help="tempo máximo de cada interação (s)")
+    parser.add_argument("--limite-p95", type=float, default=None,
+                        help="falha (código 1) se o p95 de alguma interação passar deste valor em ms")
+    parser.add_argument("--permitir-erros", action="store_true",
+                        help="não falha (código 1) quando alguma interação tiver erro")
+    args = parser.parse_args()
+
+    roteiro = sessao_calculadora if args.app == APP_CALCULADORA else sessao_dashboard
+    # Pasta de trabalho descartável: a calculadora cria o usuarios.db no diretório atual
+    with tempfile.TemporaryDirectory(prefix="teste_carga_") as pasta_trabalho:
+        processo, url = iniciar_servidor(args.app, pasta_trabalho, args.timeout)
+        amostras, parar = [], threading.Event()
+        threading.Thread(target=monitorar_memoria, args=(processo.pid, amostras, parar), daemon=True).start()
+        try:
+            resultados, trava = [], threading.Lock()
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.sessoes) as executor:
+                tarefas = [executor.submit(executar_roteiro, roteiro, url, args.iteracoes, args.timeout,
+                                           resultados, trava)
+                           for _ in range(args.sessoes)]
+                for tarefa in tarefas:
+                    tarefa.result()
+            duracao_total = time.perf_counter() - inicio
+        finally:
+            parar.set()
+            processo.terminate()
+            processo.wait()
+
+    resumo = resumir(resultados, duracao_total)
+    print(f"\n{args.app}: {args.sessoes} sessões, {len(resultados)} interações em {duracao_total:.1f}s "
+          f"({len(resultados) / duracao_total:.1f}/s)")
+    print(resumo.to_string())
+    if amostras:
+        print(f"RSS do servidor: final {amostras[-1]:.0f} MB | pico {max(amostras):.0f} MB")
+
+    falhou = False
+    if not args.permitir_erros and resumo["Erros"].sum() > 0:
+        print(f"{int(resumo['Erros'].sum())} interação(ões) com erro")
+        falhou = True
+    if args.limite_p95 is not None and (resumo["p95"] > args.limite_p95).any():
+        print(f"p95 acima de {args.limite_p95:.0f} ms")
+        falhou = True
+    if falhou:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()